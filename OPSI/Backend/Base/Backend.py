@@ -16,6 +16,7 @@ import inspect
 import os
 import re
 import time
+from functools import lru_cache
 from hashlib import md5
 from textwrap import dedent
 from typing import Union
@@ -48,11 +49,50 @@ __all__ = ("describeInterface", "Backend")
 
 OPSI_MODULES_FILE = "/etc/opsi/modules"
 OPSI_LICENSE_PATH = "/etc/opsi/licenses"
+OPSI_MODULES_PUBLIC_KEY = base64.b64decode(
+	b"AAAAB3NzaC1yc2EAAAADAQABAAABAQCAD/I79Jd0eKwwfuVwh5B2z+S8aV0C5suItJa18RrYip+d4P0ogzqoCfOoVWtDo"
+	b"jY96FDYv+2d73LsoOckHCnuh55GA0mtuVMWdXNZIE8Avt/RzbEoYGo/H0weuga7I8PuQNC/nyS8w3W8TH4pt+ZCjZZoX8"
+	b"S+IizWCYwfqYoYTMLgB0i+6TCAfJj3mNgCrDZkQ24+rOFS4a8RrjamEz/b81noWl9IntllK1hySkR+LbulfTGALHgHkDU"
+	b"lk0OSu+zBPw/hcDSOMiDQvvHfmR4quGyLPbQ2FOVm1TzE0bQPR+Bhx4V8Eo2kNYstG2eJELrz7J1TJI0rCjpB+FQjYPsP"
+)
 
 
 logger = get_logger("opsi.general")
 
 
+def _modulesFileValue(module, modules, helpermodules):
+	if module in helpermodules:
+		return helpermodules[module]
+
+	val = modules[module]
+	if isinstance(val, bool):
+		return "yes" if val else "no"
+	return val
+
+
+@lru_cache(maxsize=4)
+def _verifyModulesSignature(signature, data):
+	"""
+	Check the signature of the modules file content in `data`.
+
+	The modules file rarely changes but is read on every backend_info
+	call, so the verdict is cached.
+	"""
+	publicKey = getPublicKey(data=OPSI_MODULES_PUBLIC_KEY)
+	if signature.startswith("{"):
+		s_bytes = int(signature.split("}", 1)[-1]).to_bytes(256, "big")
+		try:
+			pkcs1_15.new(publicKey).verify(MD5.new(data.encode()), s_bytes)
+			return True
+		except ValueError:
+			# Invalid signature
+			return False
+
+	h_int = int.from_bytes(md5(data.encode()).digest(), "big")
+	s_int = publicKey._encrypt(int(signature))  # pylint: disable=protected-access
+	return h_int == s_int
+
+
 def describeInterface(instance):  # pylint: disable=too-many-locals
 	"""
 	Describes what public methods are available and the signatures they use.
@@ -167,6 +207,7 @@ class Backend:  # pylint: disable=too-many-instance-attributes
 
 	matchCache = {}
 	option_defaults = {}
+	_OPERATOR_IN_FILTER_PATTERN = re.compile(r"^\s*([>=<]+)\s*([\d.]+)")
 
 	def __init__(self, **kwargs):
 		"""
@@ -225,6 +266,16 @@ This defaults to ``self``.
 		"""Getting the context backend."""
 		return self._context
 
+	@staticmethod
+	@lru_cache(maxsize=128)
+	def _getSubClassNames(className):
+		"""
+		Returns the names of the subclasses registered for the opsi object class `className`.
+
+		:rtype: frozenset
+		"""
+		return frozenset(eval(className).subClasses)  # pylint: disable=eval-used
+
 	def _objectHashMatches(self, objHash, **filter):  # pylint: disable=redefined-builtin,too-many-branches
 		"""
 		Checks if the opsi object hash matches the filter.
@@ -244,13 +295,8 @@ This defaults to ``self``.
 				else:
 					for filterValue in filterValues:
 						if attribute == "type":
-							match = False
-							Class = eval(filterValue)  # pylint: disable=eval-used
-							for subClass in Class.subClasses:
-								if subClass == value:
-									matched = True
-									break
-
+							if value in self._getSubClassNames(filterValue):
+								matched = True
 							continue
 
 						if isinstance(value, list):
@@ -262,10 +308,10 @@ This defaults to ``self``.
 						if value is None or isinstance(value, bool):
 							continue
 
-						if isinstance(value, (float, int)) or re.search(r"^\s*([>=<]+)\s*([\d.]+)", forceUnicode(filterValue)):
+						match = self._OPERATOR_IN_FILTER_PATTERN.search(filterValue)
+						if match or isinstance(value, (float, int)):
 							operator = "=="
-							val = forceUnicode(filterValue)
-							match = re.search(r"^\s*([>=<]+)\s*([\d.]+)", filterValue)
+							val = filterValue
 							if match:
 								operator = match.group(1)  # pylint: disable=maybe-no-member
 								val = match.group(2)  # pylint: disable=maybe-no-member
@@ -382,41 +428,12 @@ This defaults to ``self``.
 					modules = {"valid": False}
 					raise ValueError("Signature expired")
 
-				publicKey = getPublicKey(
-					data=base64.decodebytes(
-						b"AAAAB3NzaC1yc2EAAAADAQABAAABAQCAD/I79Jd0eKwwfuVwh5B2z+S8aV0C5suItJa18RrYip+d4P0ogzqoCfOoVWtDo"
-						b"jY96FDYv+2d73LsoOckHCnuh55GA0mtuVMWdXNZIE8Avt/RzbEoYGo/H0weuga7I8PuQNC/nyS8w3W8TH4pt+ZCjZZoX8"
-						b"S+IizWCYwfqYoYTMLgB0i+6TCAfJj3mNgCrDZkQ24+rOFS4a8RrjamEz/b81noWl9IntllK1hySkR+LbulfTGALHgHkDU"
-						b"lk0OSu+zBPw/hcDSOMiDQvvHfmR4quGyLPbQ2FOVm1TzE0bQPR+Bhx4V8Eo2kNYstG2eJELrz7J1TJI0rCjpB+FQjYPsP"
-					)
+				data = "".join(
+					f"{module.lower().strip()} = {_modulesFileValue(module, modules, helpermodules)}\r\n"
+					for module in sorted(modules)
+					if module not in ("valid", "signature")
 				)
-				data = ""
-				mks = list(modules.keys())
-				mks.sort()
-				for module in mks:
-					if module in ("valid", "signature"):
-						continue
-					if module in helpermodules:
-						val = helpermodules[module]
-					else:
-						val = modules[module]
-						if isinstance(val, bool):
-							val = "yes" if val else "no"
-					data += f"{module.lower().strip()} = {val}\r\n"
-
-				modules["valid"] = False
-				if modules["signature"].startswith("{"):
-					s_bytes = int(modules["signature"].split("}", 1)[-1]).to_bytes(256, "big")
-					try:
-						pkcs1_15.new(publicKey).verify(MD5.new(data.encode()), s_bytes)
-						modules["valid"] = True
-					except ValueError:
-						# Invalid signature
-						pass
-				else:
-					h_int = int.from_bytes(md5(data.encode()).digest(), "big")
-					s_int = publicKey._encrypt(int(modules["signature"]))  # pylint: disable=protected-access
-					modules["valid"] = h_int == s_int
+				modules["valid"] = _verifyModulesSignature(modules["signature"], data)
 
 			except Exception as err:  # pylint: disable=broad-except
 				logger.error("Failed to read opsi modules file '%s': %s", self._opsiModulesFile, err)
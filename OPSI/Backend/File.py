@@ -759,21 +759,13 @@ class FileBackend(ConfigDataBackend):  # pylint: disable=too-many-instance-attri
 		if filter.get('type'):
 			match = False
 			for objectType in forceList(filter['type']):
-				if objectType == objType:
+				if (
+					objectType == objType
+					or objType in self._getSubClassNames(objectType)
+					or objectType in self._getSubClassNames(objType)
+				):
 					match = True
 					break
-				Class = eval(objectType)  # pylint: disable=eval-used
-				for subClass in Class.subClasses:
-					if subClass == objType:
-						match = True
-						break
-				Class = eval(objType)  # pylint: disable=eval-used
-				for subClass in Class.subClasses:
-					if subClass == objectType:
-						match = True
-						break
-				if match:
-					break
 
 			if not match:
 				logger.debug("Object type '%s' does not match filter %s", objType, filter)
@@ -45,6 +45,14 @@ __all__ = ("BackendAccessControl",)
 
 logger = get_logger("opsi.general")
 
+_HARDWARE_ADDRESS_REGEX = re.compile(r"^[a-fA-F0-9]{2}(:[a-fA-F0-9]{2}){5}$")
+
+
+def _isFqdnLike(username: str) -> bool:
+	"""Checks for at least three dot separated labels without whitespace in the last one."""
+	labels = username.split(".", 2)
+	return len(labels) == 3 and all(labels) and not any(char.isspace() for char in labels[2])
+
 
 class UserStore:  # pylint: disable=too-few-public-methods
 	"""Stores user information"""
@@ -150,7 +158,7 @@ class BackendAccessControl:
 		self, username: str, password: str, forceGroups: List[str] = None, auth_type: str = None
 	):  # pylint: disable=too-many-branches,too-many-statements
 		if not auth_type:
-			if re.search(r"^[^.]+\.[^.]+\.\S+$", username) or re.search(r"^[a-fA-F0-9]{2}(:[a-fA-F0-9]{2}){5}$", username):
+			if _isFqdnLike(username) or _HARDWARE_ADDRESS_REGEX.search(username):
 				# Username is a fqdn or mac address
 				auth_type = "opsi-hostkey"
 			else:
@@ -169,7 +177,7 @@ class BackendAccessControl:
 			if self.auth_type == "opsi-hostkey":
 				self.user_store.username = self.user_store.username.lower()
 				host_filter = {}
-				if re.search(r"^[a-fA-F0-9]{2}(:[a-fA-F0-9]{2}){5}$", self.user_store.username):
+				if _HARDWARE_ADDRESS_REGEX.search(self.user_store.username):
 					logger.debug("Trying to authenticate by mac address and opsi host key")
 					host_filter["hardwareAddress"] = self.user_store.username
 				else:
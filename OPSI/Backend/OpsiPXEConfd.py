@@ -6,7 +6,6 @@
 OpsiPXEConfd-Backend
 """
 
-import codecs
 import json
 import os
 import socket
@@ -15,7 +14,7 @@ import threading
 import time
 from contextlib import closing, contextmanager
 from shlex import quote
-from typing import Any, Dict, Generator, List
+from typing import Any, Dict, Generator, List, Tuple
 
 from opsicommon.exceptions import (
 	BackendMissingDataError,
@@ -26,8 +25,8 @@ from opsicommon.logging import get_logger, secret_filter
 from opsicommon.objects import (
 	ConfigState,
 	OpsiClient,
+	Product,
 	ProductOnClient,
-	ProductPropertyState,
 	serialize,
 )
 from opsicommon.system.network import get_fqdn
@@ -40,6 +39,8 @@ from OPSI.Backend.JSONRPC import JSONRPCBackend
 __all__ = ("ServerConnection", "OpsiPXEConfdBackend", "createUnixSocket")
 
 ERROR_MARKER = "(ERROR)"
+PXE_CONFIG_IDS = frozenset(("opsi-linux-bootimage.append", "clientconfig.configserver.url", "clientconfig.dhcpd.filename"))
+_CACHE_DIRECTORY = None
 
 logger = get_logger("opsi.general")
 
@@ -47,25 +48,46 @@ logger = get_logger("opsi.general")
 class ServerConnection:  # pylint: disable=too-few-public-methods
 	def __init__(self, port: str, timeout: int = 10) -> None:
 		self.port = port
-		self.timeout = forceInt(timeout)
+		self.timeout = timeout if isinstance(timeout, int) else forceInt(timeout)
 
 	def sendCommand(self, cmd: str) -> str:
 		with createUnixSocket(self.port, timeout=self.timeout) as unixSocket:
-			unixSocket.send(forceUnicode(cmd).encode("utf-8"))
+			# Commands are usually built as str already
+			unixSocket.send((cmd if isinstance(cmd, str) else forceUnicode(cmd)).encode("utf-8"))
 
-			result = ""
+			received = bytearray()
 			try:
-				for part in iter(lambda: unixSocket.recv(4096), b""):
+				for part in iter(lambda: unixSocket.recv(65536), b""):
 					logger.trace("Received %s", part)
-					result += forceUnicode(part)
+					received += part
 			except Exception as err:  # pylint: disable=broad-except
 				raise RuntimeError(f"Failed to receive: {err}") from err
 
+		# Decode once, a multi-byte character may be split between parts
+		result = received.decode("utf-8", "replace")
+
 		if result.startswith(ERROR_MARKER):
 			raise RuntimeError(f"Command '{cmd}' failed: {result}")
 
 		return result
 
+	def sendCommands(self, commands: List[Tuple[str, str]]) -> Generator[Tuple[str, Any], None, None]:
+		"""
+		Send a batch of commands.
+
+		opsipxeconfd answers a single command per connection, so each
+		command still uses its own connection.
+
+		:param commands: Pairs of a key (i.e. the client id) and the command to send.
+		:returns: Pairs of the key and either the result or the exception raised for the command.
+		"""
+		for key, cmd in commands:
+			logger.debug("Sending command %s", cmd)
+			try:
+				yield key, self.sendCommand(cmd)
+			except Exception as err:  # pylint: disable=broad-except
+				yield key, err
+
 
 @contextmanager
 def createUnixSocket(port: int, timeout: float = 5.0) -> Generator[socket.socket, None, None]:
@@ -81,14 +103,16 @@ def createUnixSocket(port: int, timeout: float = 5.0) -> Generator[socket.socket
 
 
 def getClientCacheFilePath(clientId: str) -> str:
-	if os.path.exists("/var/run/opsipxeconfd"):
-		directory = "/var/run/opsipxeconfd"
+	global _CACHE_DIRECTORY  # pylint: disable=global-statement
+	if _CACHE_DIRECTORY is not None:
+		directory = _CACHE_DIRECTORY
+	elif os.path.exists("/var/run/opsipxeconfd"):
+		# Only the opsipxeconfd directory is remembered, the fallback
+		# is re-checked until opsipxeconfd created its directory.
+		directory = _CACHE_DIRECTORY = "/var/run/opsipxeconfd"
 	else:
 		directory = os.path.join(tempfile.gettempdir(), ".opsipxeconfd")
-		try:
-			os.makedirs(directory)
-		except OSError:
-			pass  # directory exists
+		os.makedirs(directory, exist_ok=True)
 
 	return os.path.join(directory, clientId + ".json")
 
@@ -96,6 +120,9 @@ def getClientCacheFilePath(clientId: str) -> str:
 class OpsiPXEConfdBackend(ConfigDataBackend):  # pylint: disable=too-many-instance-attributes
 	"""Backend holding information regarding PXE boot."""
 
+	_BACKEND_INFO_CACHE_TIME = 30.0
+	_PRODUCT_CACHE_TIME = 60.0
+
 	def __init__(self, **kwargs) -> None:
 		ConfigDataBackend.__init__(self, **kwargs)
 
@@ -105,8 +132,13 @@ class OpsiPXEConfdBackend(ConfigDataBackend):  # pylint: disable=too-many-instan
 		self._depotId = forceHostId(get_fqdn())
 		self._opsiHostKey = None
 		self._depotConnections = {}
-		self._updateThreads = {}
-		self._updateThreadsLock = threading.Lock()
+		self._depotConnectionsLock = threading.Lock()
+		self._cachedDataSupport = {}
+		self._updateThread = None
+		self._updateThreadLock = threading.Lock()
+		self._backendInfo = None
+		self._backendInfoExpires = 0.0
+		self._productCache = {}
 		self._parseArguments(kwargs)
 
 	def _get_opsi_host_key(self, backend: Backend = None) -> None:
@@ -138,11 +170,12 @@ class OpsiPXEConfdBackend(ConfigDataBackend):  # pylint: disable=too-many-instan
 		if depot == self._depotId:
 			return self
 
-		if depot not in self._depotConnections:
-			if not self._opsiHostKey:
-				self._get_opsi_host_key()
-			self._depotConnections[depot] = self._getExternalBackendConnection(depot, self._depotId, self._opsiHostKey, port=port)
-		return self._depotConnections[depot]
+		with self._depotConnectionsLock:
+			if depot not in self._depotConnections:
+				if not self._opsiHostKey:
+					self._get_opsi_host_key()
+				self._depotConnections[depot] = self._getExternalBackendConnection(depot, self._depotId, self._opsiHostKey, port=port)
+			return self._depotConnections[depot]
 
 	def _getExternalBackendConnection(self, address: str, username: str, password: str, port: int = 4447) -> JSONRPCBackend:
 		secret_filter.add_secrets(password)
@@ -152,17 +185,36 @@ class OpsiPXEConfdBackend(ConfigDataBackend):  # pylint: disable=too-many-instan
 			raise BackendUnableToConnectError(f"Failed to connect to depot '{address}': {err}") from err
 
 	def _getResponsibleDepotId(self, clientId: str) -> str:
-		configStates = self._context.configState_getObjects(configId="clientconfig.depot.id", objectId=clientId)  # pylint: disable=maybe-no-member
-		if configStates and configStates[0].values:
-			depotId = configStates[0].values[0]
-		else:
+		return self._getResponsibleDepotIds([clientId])[clientId]
+
+	def _getResponsibleDepotIds(self, clientIds: List[str]) -> Dict[str, str]:
+		"""
+		Get the depots responsible for the given clients with a single query.
+
+		:returns: A dict mapping each client id to its depot id.
+		"""
+		depotIds = {}
+		if not clientIds:
+			# An empty objectId filter would match all clients
+			return depotIds
+
+		configStates = self._context.configState_getObjects(configId="clientconfig.depot.id", objectId=clientIds)  # pylint: disable=maybe-no-member
+		for configState in configStates:
+			if configState.values:
+				depotIds[configState.objectId] = configState.values[0]
+
+		clientsWithoutDepot = [clientId for clientId in clientIds if clientId not in depotIds]
+		if clientsWithoutDepot:
 			configs = self._context.config_getObjects(id="clientconfig.depot.id")  # pylint: disable=maybe-no-member
 			if not configs or not configs[0].defaultValues:
 				raise BackendUnaccomplishableError(
-					f"Failed to get depotserver for client '{clientId}', config 'clientconfig.depot.id' not set and no defaults found"
+					f"Failed to get depotserver for client '{', '.join(clientsWithoutDepot)}', "
+					"config 'clientconfig.depot.id' not set and no defaults found"
 				)
-			depotId = configs[0].defaultValues[0]
-		return depotId
+			for clientId in clientsWithoutDepot:
+				depotIds[clientId] = configs[0].defaultValues[0]
+
+		return depotIds
 
 	def _pxeBootConfigurationUpdateNeeded(self, productOnClient: ProductOnClient) -> bool:
 		if productOnClient.productType != "NetbootProduct":
@@ -206,45 +258,37 @@ class OpsiPXEConfdBackend(ConfigDataBackend):  # pylint: disable=too-many-instan
 
 			# Get the product information for the version present on
 			# the depot.
-			product = self._context.product_getObjects(
-				attributes=["id", "pxeConfigTemplate"],
-				type="NetbootProduct",
-				id=productOnClient.productId,
-				productVersion=productOnDepot.productVersion,
-				packageVersion=productOnDepot.packageVersion,
-			)[0]
+			product = self._getNetbootProduct(productOnClient.productId, productOnDepot.productVersion, productOnDepot.packageVersion)
+
+			configStates = {configState.configId: configState for configState in self._collectConfigStates(clientId)}
 
-			eliloMode = None
 			serviceAddress = None
-			bootimageAppend = ""
-			for configState in self._collectConfigStates(clientId):
-				if configState.configId == "clientconfig.configserver.url":
-					serviceAddress = configState.getValues()[0]
-				elif configState.configId == "opsi-linux-bootimage.append":
-					bootimageAppend = configState
-				elif configState.configId == "clientconfig.dhcpd.filename":
-					try:
-						value = configState.getValues()[0]
-						if ("elilo" in value) or ("shim" in value):
-							if "x86" in value:
-								eliloMode = "x86"
-							else:
-								eliloMode = "x64"
-					except IndexError:
-						# If we land here there is no default value set
-						# and no items are present.
-						pass
-					except Exception as err:  # pylint: disable=broad-except
-						logger.debug("Failed to detect elilo setting for %s: %s", clientId, err)
+			if "clientconfig.configserver.url" in configStates:
+				serviceAddress = configStates["clientconfig.configserver.url"].getValues()[0]
+
+			bootimageAppend = configStates.get("opsi-linux-bootimage.append", "")
+
+			eliloMode = None
+			if "clientconfig.dhcpd.filename" in configStates:
+				try:
+					value = configStates["clientconfig.dhcpd.filename"].getValues()[0]
+					if ("elilo" in value) or ("shim" in value):
+						if "x86" in value:
+							eliloMode = "x86"
+						else:
+							eliloMode = "x64"
+				except IndexError:
+					# If we land here there is no default value set
+					# and no items are present.
+					pass
+				except Exception as err:  # pylint: disable=broad-except
+					logger.debug("Failed to detect elilo setting for %s: %s", clientId, err)
 
 			productPropertyStates = self._collectProductPropertyStates(clientId, productOnClient.productId, depotId)
 			logger.debug("Collected product property states: %s", productPropertyStates)
 
-			backendinfo = self._context.backend_info()
-			backendinfo["hostCount"] = len(self._context.host_getObjects(attributes=["id"], type="OpsiClient"))
-
 			data = {
-				"backendInfo": backendinfo,
+				"backendInfo": self._getBackendInfo(),
 				"host": host,
 				"productOnClient": productOnClient,
 				"depotId": depotId,
@@ -264,24 +308,58 @@ class OpsiPXEConfdBackend(ConfigDataBackend):  # pylint: disable=too-many-instan
 
 		return data
 
-	def _collectConfigStates(self, clientId: str) -> List[ConfigState]:
-		configIds = [
-			"opsi-linux-bootimage.append",
-			"clientconfig.configserver.url",
-			"clientconfig.dhcpd.filename",
-		]
+	def _getNetbootProduct(self, productId: str, productVersion: str, packageVersion: str) -> Product:
+		"""
+		Get the netboot product in the given version.
+
+		During a rollout the same product is requested for every client.
+		Results are cached for a short time so that changes to the
+		product still reach opsipxeconfd.
+		"""
+		key = (productId, productVersion, packageVersion)
+		now = time.monotonic()
+		try:
+			expires, product = self._productCache[key]
+			if now <= expires:
+				return product
+		except KeyError:
+			pass
+
+		product = self._context.product_getObjects(
+			attributes=["id", "pxeConfigTemplate"],
+			type="NetbootProduct",
+			id=productId,
+			productVersion=productVersion,
+			packageVersion=packageVersion,
+		)[0]
+		self._productCache[key] = (now + self._PRODUCT_CACHE_TIME, product)
+		return product
+
+	def _getBackendInfo(self) -> Dict[str, Any]:
+		"""
+		Get the backend info including the client count.
+
+		This is the same for every client and counting the clients reads
+		all of them, so the result is reused for a short time.
+		"""
+		if self._backendInfo is None or time.monotonic() > self._backendInfoExpires:
+			backendinfo = self._context.backend_info()
+			backendinfo["hostCount"] = len(self._context.host_getObjects(attributes=["id"], type="OpsiClient"))
+			self._backendInfo = backendinfo
+			self._backendInfoExpires = time.monotonic() + self._BACKEND_INFO_CACHE_TIME
+
+		return dict(self._backendInfo)
 
-		configStates = self._context.configState_getObjects(objectId=clientId, configId=configIds)
+	def _collectConfigStates(self, clientId: str) -> List[ConfigState]:
+		configStates = self._context.configState_getObjects(objectId=clientId, configId=list(PXE_CONFIG_IDS))
 
-		if len(configIds) == len(configStates):
+		missingConfigStateIds = PXE_CONFIG_IDS.difference(cs.configId for cs in configStates)
+		if not missingConfigStateIds:
 			# We have a value set for each of our configIds - exiting.
 			return configStates
 
-		existingConfigStateIds = set(cs.configId for cs in configStates)
-		missingConfigStateIds = set(configIds) - existingConfigStateIds
-
 		# Create missing config states
-		for config in self._context.config_getObjects(id=missingConfigStateIds):
+		for config in self._context.config_getObjects(id=list(missingConfigStateIds)):
 			logger.debug("Got default values for %s: %s", config.id, config.defaultValues)
 			# Config state does not exist for client => create default
 			cf = ConfigState(configId=config.id, objectId=clientId, values=config.defaultValues)
@@ -291,56 +369,65 @@ class OpsiPXEConfdBackend(ConfigDataBackend):  # pylint: disable=too-many-instan
 		return configStates
 
 	def _collectProductPropertyStates(self, clientId: str, productId: str, depotId: str) -> Dict[str, str]:
-		productPropertyStates = self._context.productPropertyState_getObjects(objectId=clientId, productId=productId)
-
-		propertyStatePropertyIds = set(pps.propertyId for pps in productPropertyStates)
+		productPropertyStates = {
+			pps.propertyId: pps for pps in self._context.productPropertyState_getObjects(objectId=clientId, productId=productId)
+		}
 
-		# Create missing product property states
 		for pps in self._context.productPropertyState_getObjects(productId=productId, objectId=depotId):
-			if pps.propertyId not in propertyStatePropertyIds:
-				# Product property for client does not exist => add default (values of depot)
-				productPropertyStates.append(
-					ProductPropertyState(productId=pps.productId, propertyId=pps.propertyId, objectId=clientId, values=pps.values)
-				)
+			# Product property for client does not exist => use default (values of depot)
+			productPropertyStates.setdefault(pps.propertyId, pps)
 
-		return {pps.propertyId: ",".join(forceUnicodeList(pps.getValues())) for pps in productPropertyStates}
+		return {propertyId: ",".join(forceUnicodeList(pps.getValues())) for propertyId, pps in productPropertyStates.items()}
 
 	def _updateByProductOnClient(self, productOnClient: ProductOnClient) -> None:
 		if not self._pxeBootConfigurationUpdateNeeded(productOnClient):
 			return
 
-		def backendSupportsCachedData(destination):
-			if destination == self:
-				return True
-
-			for method in destination.backend_getInterface():
-				if method["name"] == "opsipxeconfd_updatePXEBootConfiguration":
-					if len(method["params"]) < 2:
-						logger.debug("Depot %s does not support receiving cached data.", responsibleDepot)
-						return False
+		self._updateByClientId(productOnClient.clientId)
 
-					break
-
-			# We assume this as our default.
+	def _backendSupportsCachedData(self, destination: Backend) -> bool:
+		if destination is self:
 			return True
 
-		responsibleDepot = self._getResponsibleDepotId(productOnClient.clientId)
+		try:
+			return self._cachedDataSupport[id(destination)]
+		except KeyError:
+			pass
+
+		# We assume this as our default.
+		supported = True
+		for method in destination.backend_getInterface():
+			if method["name"] == "opsipxeconfd_updatePXEBootConfiguration":
+				if len(method["params"]) < 2:
+					logger.debug("Depot %s does not support receiving cached data.", destination)
+					supported = False
+				break
+
+		self._cachedDataSupport[id(destination)] = supported
+		return supported
+
+	def _updateByClientId(self, clientId: str, responsibleDepot: str = None) -> None:
+		if not responsibleDepot:
+			responsibleDepot = self._getResponsibleDepotId(clientId)
 		if ":" in self._port:
 			# Prefer connections to addr:port over all others.
 			# They are used in scaled setups.
 			depot, port = self._port.split(":")
 			destination = self._getDepotConnection(depot, port)
 		elif responsibleDepot != self._depotId:
-			logger.info("Not responsible for client '%s', forwarding request to depot %s", productOnClient.clientId, responsibleDepot)
+			logger.info("Not responsible for client '%s', forwarding request to depot %s", clientId, responsibleDepot)
 			destination = self._getDepotConnection(responsibleDepot)
 		else:
 			destination = self
 
-		if backendSupportsCachedData(destination):
-			data = self._collectDataForUpdate(productOnClient.clientId, responsibleDepot)
-			destination.opsipxeconfd_updatePXEBootConfiguration(productOnClient.clientId, data)
+		if destination is self:
+			# _collectDataForUpdate returns serialized data
+			self._updatePXEBootConfiguration(clientId, self._collectDataForUpdate(clientId, responsibleDepot), dataSerialized=True)
+		elif self._backendSupportsCachedData(destination):
+			data = self._collectDataForUpdate(clientId, responsibleDepot)
+			destination.opsipxeconfd_updatePXEBootConfiguration(clientId, data)
 		else:
-			destination.opsipxeconfd_updatePXEBootConfiguration(productOnClient.clientId)
+			destination.opsipxeconfd_updatePXEBootConfiguration(clientId)
 
 	def opsipxeconfd_updatePXEBootConfiguration(self, clientId: str, data: Dict[str, Any] = None) -> None:
 		"""
@@ -350,22 +437,27 @@ class OpsiPXEConfdBackend(ConfigDataBackend):  # pylint: disable=too-many-instan
 		:param clientId: The client whose boot configuration should be updated.
 		:param data: Collected data for opsipxeconfd.
 		"""
-		clientId = forceHostId(clientId)
+		self._updatePXEBootConfiguration(forceHostId(clientId), data)
+
+	def _updatePXEBootConfiguration(self, clientId: str, data: Dict[str, Any] = None, dataSerialized: bool = False) -> None:
 		logger.debug("Updating PXE boot config of %s", clientId)
 
 		command = f"update {clientId}"
 		if data:
-			cacheFilePath = self._cacheOpsiPXEConfdData(clientId, data)
+			cacheFilePath = self._cacheOpsiPXEConfdData(clientId, data if dataSerialized else serialize(data))
 			if cacheFilePath:
 				command = f"update {clientId} {quote(cacheFilePath)}"
 
-		with self._updateThreadsLock:
-			if clientId not in self._updateThreads:
-				updater = UpdateThread(self, clientId, command)
-				self._updateThreads[clientId] = updater
-				updater.start()
-			else:
-				self._updateThreads[clientId].delay()
+		# Reading the attribute is atomic, the lock is only needed to start a new thread
+		updateThread = self._updateThread
+		if updateThread and updateThread.addUpdate(clientId, command):
+			return
+
+		with self._updateThreadLock:
+			if not self._updateThread or not self._updateThread.addUpdate(clientId, command):
+				self._updateThread = UpdateThread(self)
+				self._updateThread.addUpdate(clientId, command)
+				self._updateThread.start()
 
 	@staticmethod
 	def _cacheOpsiPXEConfdData(clientId: str, data: Any) -> str:
@@ -374,21 +466,35 @@ class OpsiPXEConfdBackend(ConfigDataBackend):  # pylint: disable=too-many-instan
 
 		:param clientId: The client for whom this data is.
 		:type clientId: str
-		:param data: Collected data for opsipxeconfd.
+		:param data: Collected data for opsipxeconfd, already serialized.
 		:type data: dict
 		:rtype: str
 		:returns: The path of the cache file. None if no file could be written.
 		"""
-		destinationFile = getClientCacheFilePath(clientId)
+		try:
+			destinationFile = getClientCacheFilePath(clientId)
+		except OSError as dirError:
+			logger.debug("Creating cache directory for client %s failed: %s", clientId, dirError)
+			return None
+
+		# Write to a temporary file first so opsipxeconfd never reads a partially written file
+		temporaryFile = f"{destinationFile}.{os.getpid()}.{threading.get_ident()}.tmp"
 		logger.trace("Writing data to %s: %s", destinationFile, data)
 		try:
-			with codecs.open(destinationFile, "w", "utf-8") as outfile:
-				json.dump(serialize(data), outfile)
-			os.chmod(destinationFile, 0o640)
+			with open(os.open(temporaryFile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o640), "wb") as outfile:
+				# The mode given to os.open is subject to the umask
+				os.fchmod(outfile.fileno(), 0o640)
+				outfile.write(json.dumps(data).encode("ascii"))
+			os.replace(temporaryFile, destinationFile)
 			return destinationFile
-		except (OSError, IOError) as dataFileError:
+		except Exception as dataFileError:  # pylint: disable=broad-except
+			# Also covers data that cannot be encoded, opsipxeconfd then collects the data itself
 			logger.debug(dataFileError, exc_info=True)
 			logger.debug("Writing cache file %s failed: %s", destinationFile, dataFileError)
+			try:
+				os.remove(temporaryFile)
+			except OSError:
+				pass
 		return None
 
 	def backend_exit(self) -> None:
@@ -397,10 +503,14 @@ class OpsiPXEConfdBackend(ConfigDataBackend):  # pylint: disable=too-many-instan
 				connection.backend_exit()
 			except Exception:  # pylint: disable=broad-except
 				pass
+		self._cachedDataSupport = {}
+		self._productCache = {}
+
+		with self._updateThreadLock:
+			updateThread = self._updateThread
 
-		with self._updateThreadsLock:
-			for updateThread in self._updateThreads.values():
-				updateThread.join(5)
+		if updateThread:
+			updateThread.join(5)
 
 	def host_updateObject(self, host: OpsiClient) -> None:
 		if not isinstance(host, OpsiClient):
@@ -419,12 +529,33 @@ class OpsiPXEConfdBackend(ConfigDataBackend):  # pylint: disable=too-many-instan
 		self._updateByProductOnClient(productOnClient)
 
 	def productOnClient_deleteObjects(self, productOnClients: List[ProductOnClient]) -> None:
+		# Mostly localboot products, filter before resolving any depots.
+		# opsipxeconfd reads the complete state of a client, so one update
+		# per client is enough.
+		clientIds = list(
+			dict.fromkeys(
+				productOnClient.clientId for productOnClient in productOnClients if self._pxeBootConfigurationUpdateNeeded(productOnClient)
+			)
+		)
+		if not clientIds:
+			return
+
+		try:
+			depotIds = self._getResponsibleDepotIds(clientIds)
+		except Exception as err:  # pylint: disable=broad-except
+			# Errors are reported per client below
+			logger.debug("Failed to get responsible depots: %s", err)
+			depotIds = {}
+
 		errors = []
-		for productOnClient in productOnClients:
+		# Not parallelized: worker threads would not see the request's
+		# contextvars (e.g. the ACL user_store) and not every backend
+		# supports concurrent reads.
+		for clientId in clientIds:
 			try:
-				self._updateByProductOnClient(productOnClient)
+				self._updateByClientId(clientId, depotIds.get(clientId))
 			except Exception as err:  # pylint: disable=broad-except
-				logger.error("_updateByProductOnClient failed: %s", err, exc_info=True)
+				logger.error("_updateByClientId failed: %s", err, exc_info=True)
 				errors.append(str(err))
 
 		if errors:
@@ -457,37 +588,67 @@ class OpsiPXEConfdBackend(ConfigDataBackend):  # pylint: disable=too-many-instan
 
 
 class UpdateThread(threading.Thread):
+	"""
+	Sends the pending update commands to opsipxeconfd.
+
+	Every client gets its command sent once no further update for it was
+	requested within `_DEFAULT_DELAY` seconds. A single thread handles all
+	clients and ends as soon as there is nothing left to send.
+	"""
+
 	_DEFAULT_DELAY = 3.0
 
-	def __init__(self, opsiPXEConfdBackend: OpsiPXEConfdBackend, clientId: str, command: str) -> None:
+	def __init__(self, opsiPXEConfdBackend: OpsiPXEConfdBackend) -> None:
 		threading.Thread.__init__(self)
 		self._opsiPXEConfdBackend = opsiPXEConfdBackend
-		self._clientId = clientId
-		self._command = command
-		self._delay = self._DEFAULT_DELAY
+		self._pendingUpdates = {}
+		self._condition = threading.Condition()
+		self._finished = False
 
-	def run(self) -> None:
-		logger.debug("UpdateThread %s waiting until delay is done...", self.name)
-		delayReduction = 0.2
-		while self._delay > 0:
-			time.sleep(delayReduction)
-			self._delay -= delayReduction
+	def addUpdate(self, clientId: str, command: str) -> bool:
+		"""
+		Schedule `command` for `clientId`, replacing and delaying an update already pending for the client.
 
-		with self._opsiPXEConfdBackend._updateThreadsLock:  # pylint: disable=protected-access
-			try:
-				logger.info("Updating pxe boot configuration for client '%s'", self._clientId)
-				sc = ServerConnection(
-					self._opsiPXEConfdBackend._port,  # pylint: disable=protected-access
-					self._opsiPXEConfdBackend._timeout,  # pylint: disable=protected-access
-				)
-				logger.debug("Sending command %s", self._command)
-				result = sc.sendCommand(self._command)
-				logger.debug("Got result %s", result)
-			except Exception as err:  # pylint: disable=broad-except
-				logger.critical("Failed to update PXE boot configuration for client '%s': %s", self._clientId, err)
-			finally:
-				del self._opsiPXEConfdBackend._updateThreads[self._clientId]  # pylint: disable=protected-access
+		:returns: False if the thread already finished and cannot take new updates.
+		"""
+		with self._condition:
+			if self._finished:
+				return False
+
+			if clientId in self._pendingUpdates:
+				logger.debug("Resetted delay for update of client %s", clientId)
+			self._pendingUpdates[clientId] = (time.monotonic() + self._DEFAULT_DELAY, command)
+			self._condition.notify()
+		return True
 
-	def delay(self) -> None:
-		self._delay = self._DEFAULT_DELAY
-		logger.debug("Resetted delay for UpdateThread %s", self.name)
+	def _getDueUpdates(self) -> List[Tuple[str, str]]:
+		with self._condition:
+			while True:
+				if not self._pendingUpdates:
+					self._finished = True
+					return []
+
+				now = time.monotonic()
+				dueClientIds = [clientId for clientId, (deadline, _command) in self._pendingUpdates.items() if deadline <= now]
+				if dueClientIds:
+					return [(clientId, self._pendingUpdates.pop(clientId)[1]) for clientId in dueClientIds]
+
+				logger.debug("UpdateThread %s waiting until delay is done...", self.name)
+				self._condition.wait(min(deadline for deadline, _command in self._pendingUpdates.values()) - now)
+
+	def run(self) -> None:
+		sc = ServerConnection(
+			self._opsiPXEConfdBackend._port,  # pylint: disable=protected-access
+			self._opsiPXEConfdBackend._timeout,  # pylint: disable=protected-access
+		)
+		while True:
+			dueUpdates = self._getDueUpdates()
+			if not dueUpdates:
+				return
+
+			logger.info("Updating pxe boot configuration for clients %s", ", ".join(clientId for clientId, _command in dueUpdates))
+			for clientId, result in sc.sendCommands(dueUpdates):
+				if isinstance(result, Exception):
+					logger.critical("Failed to update PXE boot configuration for client '%s': %s", clientId, result)
+				else:
+					logger.debug("Got result %s", result)
@@ -8,7 +8,7 @@ SQLite backend.
 
 import os
 import sqlite3
-import threading
+from contextlib import closing
 from typing import Any, Dict, Generator
 
 from opsicommon.logging import get_logger
@@ -24,6 +24,8 @@ __all__ = ('SQLite', 'SQLiteBackend', 'SQLiteObjectBackendModificationTracker')
 
 logger = get_logger("opsi.general")
 
+JOURNAL_MODES = frozenset(('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'))
+
 
 class SQLite(SQL):
 	"""Class handling basic SQLite functionality."""
@@ -32,13 +34,13 @@ class SQLite(SQL):
 	ESCAPED_BACKSLASH = "\\"
 	ESCAPED_APOSTROPHE = "''"
 	ESCAPED_ASTERISK = "**"
-	_WRITE_LOCK = threading.Lock()
 
 	def __init__(self, **kwargs) -> None:
 		super().__init__(**kwargs)
 
 		self._database = ":memory:"
 		self._databaseCharset = 'utf8'
+		self._journalMode = None
 
 		for (option, value) in kwargs.items():
 			option = option.lower()
@@ -46,25 +48,46 @@ class SQLite(SQL):
 				self._database = forceFilename(value)
 			elif option == 'databasecharset':
 				self._databaseCharset = str(value)
+			elif option == 'journalmode':
+				journalMode = str(value).upper()
+				if journalMode not in JOURNAL_MODES:
+					raise ValueError(f"Invalid journal mode {value!r}, expected one of: {', '.join(sorted(JOURNAL_MODES))}")
+				self._journalMode = journalMode
 
 		try:
 			self.init_connection()
 		except (sqlite3.DatabaseError, sqlite3.OperationalError) as dbError:
+			if self.check_integrity():
+				raise
 			logger.error("SQLite database '%s' is defective: %s, recreating", self._database, dbError)
 			self.delete_db()
 			self.init_connection()
 		except Exception as err:  # pylint: disable=broad-except
+			if self.check_integrity():
+				raise
 			logger.error("Problem connecting to SQLite database: %s, recreating", err)
 			self.delete_db()
 			self.init_connection()
 
-	@staticmethod
-	def on_engine_connect(conn, branch) -> None:  # pylint: disable=unused-argument
-		# conn.execute('PRAGMA synchronous=OFF')
-		# conn.execute('PRAGMA temp_store=MEMORY')
-		# conn.execute('PRAGMA cache_size=5000')
-		# conn.execute('PRAGMA encoding="UTF-8"')
-		pass
+	def on_connect(self, dbapi_connection, connection_record) -> None:  # pylint: disable=unused-argument
+		"""
+		Configure a new DBAPI connection.
+
+		PRAGMAs are set per connection, so this is registered for the pool
+		`connect` event instead of running on every checkout.
+		"""
+		cursor = dbapi_connection.cursor()
+		try:
+			if self._journalMode and self._database != ":memory:":
+				cursor.execute(f"PRAGMA journal_mode={self._journalMode}")
+				if self._journalMode == "WAL":
+					# Safe with WAL and avoids a fsync per transaction
+					cursor.execute("PRAGMA synchronous=NORMAL")
+			cursor.execute("PRAGMA temp_store=MEMORY")
+			# Negative values are KiB, this is 64 MiB
+			cursor.execute("PRAGMA cache_size=-65536")
+		finally:
+			cursor.close()
 
 	def init_connection(self) -> None:
 		uri = f'sqlite:///{self._database}'
@@ -76,6 +99,7 @@ class SQLite(SQL):
 		)
 		self.engine._should_log_info = lambda: self.log_queries  # pylint: disable=protected-access
 
+		listen(self.engine, 'connect', self.on_connect)
 		listen(self.engine, 'engine_connect', self.on_engine_connect)
 
 		self.session_factory = sessionmaker(
@@ -94,10 +118,32 @@ class SQLite(SQL):
 	def __repr__(self) -> str:
 		return f"<{self.__class__.__name__}(database={self._database})>"
 
+	def check_integrity(self) -> bool:
+		"""
+		Check if the database file passes SQLite's quick_check.
+
+		An intact database is kept on errors that are not caused by \
+corruption instead of deleting all data with it.
+
+		:returns: `False` if the database is in memory, missing or defective.
+		:rtype: bool
+		"""
+		if self._database == ":memory:" or not os.path.exists(self._database):
+			return False
+
+		try:
+			with closing(sqlite3.connect(self._database)) as connection:
+				return connection.execute("PRAGMA quick_check").fetchone()[0] == "ok"
+		except sqlite3.Error as err:
+			logger.debug("Integrity check of SQLite database '%s' failed: %s", self._database, err)
+			return False
+
 	def delete_db(self) -> None:
 		self.disconnect()
-		if os.path.exists(self._database):
-			os.remove(self._database)
+		# Journal files left over from WAL mode belong to the old database
+		for filename in (self._database, f"{self._database}-wal", f"{self._database}-shm"):
+			if os.path.exists(filename):
+				os.remove(filename)
 
 	def getTables(self, session: scoped_session) -> Dict[str, Any]:
 		"""
@@ -105,7 +151,8 @@ class SQLite(SQL):
 
 		Table names will always be uppercased.
 
-		:returns: A dict with the tablename as key and the field names as value.
+		:returns: A dict with the tablename as key and a set of the \
+field names as value.
 		:rtype: dict
 		"""
 		tables = {}
@@ -113,7 +160,7 @@ class SQLite(SQL):
 		for i in self.getSet(session, 'SELECT name FROM sqlite_master WHERE type = "table";'):
 			tableName = tuple(i.values())[0].upper()
 			logger.trace(" [ %s ]", tableName)
-			fields = [j['name'] for j in self.getSet(session, f'PRAGMA table_info(`{tableName}`);')]
+			fields = {j['name'] for j in self.getSet(session, f'PRAGMA table_info(`{tableName}`);')}
 			tables[tableName] = fields
 			logger.trace("Fields in %s: %s", tableName, fields)
 
@@ -142,6 +189,8 @@ class SQLiteBackend(SQLBackend):
 		try:
 			return SQLBackend.backend_createBase(self)
 		except sqlite3.DatabaseError as dbError:
+			if self._sql.check_integrity():
+				raise
 			logger.error("SQLite database %s is defective: %s, recreating", self._sql, dbError)
 			self._sql.delete_db()
 			self._sql.connect()
@@ -180,12 +229,12 @@ class SQLiteBackend(SQLBackend):
 					hardwareConfigTableExists = hardwareConfigTableName in existingTables
 
 					if hardwareDeviceTableExists:
-						hardwareDeviceTable = f"ALTER TABLE `{hardwareDeviceTableName}`\n"
+						hardwareDeviceTable = [f"ALTER TABLE `{hardwareDeviceTableName}`\n"]
 					else:
-						hardwareDeviceTable = (
+						hardwareDeviceTable = [
 							f"CREATE TABLE `{hardwareDeviceTableName}` (\n"
 							f"`hardware_id` INTEGER NOT NULL {self._sql.AUTOINCREMENT},\n"
-						)
+						]
 
 					avoid_process_further_hw_dev = False
 					hardwareDeviceValuesProcessed = 0
@@ -197,19 +246,19 @@ class SQLiteBackend(SQLBackend):
 									# Column exists => change
 									if not self._sql.ALTER_TABLE_CHANGE_SUPPORTED:
 										continue
-									hardwareDeviceTable += f"CHANGE `{value}` `{value}` {valueInfo['Type']} NULL,\n"
+									hardwareDeviceTable.append(f"CHANGE `{value}` `{value}` {valueInfo['Type']} NULL,\n")
 								else:
 									# Column does not exist => add
-									yield f"{hardwareDeviceTable} ADD COLUMN `{value}` {valueInfo['Type']} NULL;"
+									yield f"{''.join(hardwareDeviceTable)} ADD COLUMN `{value}` {valueInfo['Type']} NULL;"
 									avoid_process_further_hw_dev = True
 							else:
-								hardwareDeviceTable += f"`{value}` {valueInfo['Type']} NULL,\n"
+								hardwareDeviceTable.append(f"`{value}` {valueInfo['Type']} NULL,\n")
 							hardwareDeviceValuesProcessed += 1
 
 					if hardwareConfigTableExists:
-						hardwareConfigTable = f"ALTER TABLE `{hardwareConfigTableName}`\n"
+						hardwareConfigTable = [f"ALTER TABLE `{hardwareConfigTableName}`\n"]
 					else:
-						hardwareConfigTable = (
+						hardwareConfigTable = [
 							f"CREATE TABLE `{hardwareConfigTableName}` (\n"
 							f"`config_id` INTEGER NOT NULL {self._sql.AUTOINCREMENT},\n"
 							"`hostId` varchar(255) NOT NULL,\n"
@@ -217,7 +266,7 @@ class SQLiteBackend(SQLBackend):
 							"`firstseen` TIMESTAMP NOT NULL DEFAULT '1970-01-01 00:00:01',\n"
 							"`lastseen` TIMESTAMP NOT NULL DEFAULT '1970-01-01 00:00:01',\n"
 							"`state` TINYINT NOT NULL,\n"
-						)
+						]
 
 					avoid_process_further_hw_cnf = False
 					hardwareConfigValuesProcessed = 0
@@ -230,29 +279,26 @@ class SQLiteBackend(SQLBackend):
 									if not self._sql.ALTER_TABLE_CHANGE_SUPPORTED:
 										continue
 
-									hardwareConfigTable += f"CHANGE `{value}` `{value}` {valueInfo['Type']} NULL,\n"
+									hardwareConfigTable.append(f"CHANGE `{value}` `{value}` {valueInfo['Type']} NULL,\n")
 								else:
 									# Column does not exist => add
-									yield f"{hardwareConfigTable} ADD COLUMN `{value}` {valueInfo['Type']} NULL;"
+									yield f"{''.join(hardwareConfigTable)} ADD COLUMN `{value}` {valueInfo['Type']} NULL;"
 									avoid_process_further_hw_cnf = True
 							else:
-								hardwareConfigTable += f"`{value}` {valueInfo['Type']} NULL,\n"
+								hardwareConfigTable.append(f"`{value}` {valueInfo['Type']} NULL,\n")
 							hardwareConfigValuesProcessed += 1
 
 					if avoid_process_further_hw_cnf or avoid_process_further_hw_dev:
 						continue
 
 					if not hardwareDeviceTableExists:
-						hardwareDeviceTable += 'PRIMARY KEY (`hardware_id`)\n'
+						hardwareDeviceTable.append('PRIMARY KEY (`hardware_id`)\n')
 					if not hardwareConfigTableExists:
-						hardwareConfigTable += 'PRIMARY KEY (`config_id`)\n'
-
-					# Remove leading and trailing whitespace
-					hardwareDeviceTable = hardwareDeviceTable.strip()
-					hardwareConfigTable = hardwareConfigTable.strip()
+						hardwareConfigTable.append('PRIMARY KEY (`config_id`)\n')
 
-					hardwareDeviceTable = removeTrailingComma(hardwareDeviceTable)
-					hardwareConfigTable = removeTrailingComma(hardwareConfigTable)
+					# Join the fragments once and remove leading and trailing whitespace
+					hardwareDeviceTable = removeTrailingComma(''.join(hardwareDeviceTable).strip())
+					hardwareConfigTable = removeTrailingComma(''.join(hardwareConfigTable).strip())
 
 					hardwareDeviceTable += finishSQLQuery(hardwareDeviceTableExists, hardwareDeviceTableName)
 					hardwareConfigTable += finishSQLQuery(hardwareConfigTableExists, hardwareConfigTableName)
@@ -263,10 +309,16 @@ class SQLiteBackend(SQLBackend):
 					if hardwareConfigValuesProcessed or not hardwareConfigTableExists:
 						yield hardwareConfigTable
 
-			for statement in getSQLStatements():
-				logger.trace("Processing statement %s", statement)
-				self._sql.execute(session, statement)
-				logger.trace("Done with statement.")
+			statements = list(getSQLStatements())
+			if statements:
+				logger.trace("Processing statements %s", statements)
+				# sqlite3 runs DDL outside of a transaction, which means a
+				# commit for every statement. Run them as one script in a
+				# single transaction instead. If a statement fails, the
+				# session rollback also ends the transaction opened here.
+				script = "\n".join(statements)
+				session.connection().connection.executescript(f"BEGIN;\n{script}\nCOMMIT;")
+				logger.trace("Done with statements.")
 
 
 class SQLiteObjectBackendModificationTracker(SQLBackendObjectModificationTracker):
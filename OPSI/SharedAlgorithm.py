@@ -203,6 +203,8 @@ class XClassifiedProduct:
 	has String member id, int members priority, revisedPriority, and a member that is intendend to be a reference to a Product
 	"""
 
+	__slots__ = ("id", "priority", "revisedPriority", "product")
+
 	def __init__(self, product: Product) -> None:
 		self.id = product.id  # pylint: disable=invalid-name
 		self.priority = product.priority  # handle this variable as final
@@ -222,6 +224,8 @@ class OrderRequirement:
 	if it is fulfilled.
 	"""
 
+	__slots__ = ("prior", "posterior", "fulfilled")
+
 	def __init__(self, prior: int, posterior: int, fulfilled: bool = False) -> None:
 		self.prior = forceInt(prior)
 		self.posterior = forceInt(posterior)
@@ -6,14 +6,16 @@
 Linux specific system functions
 """
 
-import codecs
+import logging
 import os
+import pwd
 import re
+import shutil
 import socket
 import subprocess
 import tempfile
+from shlex import quote
 
-import psutil
 from opsicommon.logging import get_logger
 
 from OPSI.System import Posix
@@ -32,7 +34,6 @@ from OPSI.System.Posix import (
 	get_subprocess_environment,
 	getActiveConsoleSessionId,
 	getActiveSessionId,
-	getActiveSessionInformation,
 	getBlockDeviceBusType,
 	getBlockDeviceContollerInfo,
 	getDefaultNetworkInterfaceName,
@@ -137,6 +138,84 @@ __all__ = (
 
 logger = get_logger("opsi.general")
 
+_NON_DIGIT_REGEX = re.compile(r"\D")
+_SMB_URI_REGEX = re.compile(r"^(smb|cifs)://([^/]+\/.+)$", re.IGNORECASE)
+_WEBDAV_URL_REGEX = re.compile(r"^(http|webdav)(s?)(://[^/]+\/.+)$", re.IGNORECASE)
+_BACKSLASHES_REGEX = re.compile(r"\\+")
+_PROC_PATH = "/proc"
+
+
+def _iterProcessEnvironments(variable=None):
+	"""
+	Yield the pid and environment of every process we are allowed to read.
+
+	This reads /proc directly. psutil.process_iter creates a Process
+	object for every pid before the environment is even looked at.
+
+	:param variable: Only yield processes that have this environment \
+variable set. Other environments are skipped before they are parsed.
+	"""
+	marker = f"{variable}=".encode() if variable else None
+	with os.scandir(_PROC_PATH) as entries:
+		for entry in entries:
+			if not entry.name.isdigit():
+				continue
+
+			try:
+				with open(f"{_PROC_PATH}/{entry.name}/environ", "rb") as file:
+					data = file.read()
+			except PermissionError as err:
+				logger.debug(err)
+				continue
+			except OSError:
+				# The process ended in the meantime
+				continue
+
+			if marker and not (data.startswith(marker) or b"\0" + marker in data):
+				continue
+
+			env = {}
+			for item in data.split(b"\0"):
+				key, sep, value = item.partition(b"=")
+				if sep:
+					env[os.fsdecode(key)] = os.fsdecode(value)
+			yield int(entry.name), env
+
+
+def _getProcessUsername(pid):
+	"""
+	Get the name of the user running the process, from its real uid.
+	"""
+	with open(f"{_PROC_PATH}/{pid}/status", "rb") as file:
+		for line in file:
+			if line.startswith(b"Uid:"):
+				uid = int(line.split()[1])
+				break
+		else:
+			raise RuntimeError(f"Failed to get uid of process {pid}")
+
+	try:
+		return pwd.getpwuid(uid).pw_name
+	except KeyError:
+		# Same fallback as psutil
+		return str(uid)
+
+
+def _getActiveSessionIds(environments):
+	user_sessions = set()
+	login_sessions = set()
+	for env in environments:
+		if env.get("USER") and env.get("DISPLAY"):
+			if env.get("DISPLAY") == ":1024":
+				continue  # never try to use :1024 session as it seems to break gdm!
+			if env.get("XDG_SESSION_CLASS") == "greeter":
+				login_sessions.add(env["DISPLAY"])
+			else:
+				user_sessions.add(env["DISPLAY"])
+
+	sessions = list(user_sessions if user_sessions else login_sessions)
+	return sorted(sessions, key=lambda s: int(_NON_DIGIT_REGEX.sub("", s)))
+
 
 def getActiveSessionIds(protocol=None, states=None):  # pylint: disable=unused-argument
 	"""
@@ -152,85 +231,82 @@ def getActiveSessionIds(protocol=None, states=None):  # pylint: disable=unused-a
 	"""
 	if states is None:
 		states = ["active", "disconnected"]
-	user_sessions = set()
-	login_sessions = set()
-	for proc in psutil.process_iter():
-		try:
-			env = proc.environ()
-			if env.get("USER") and env.get("DISPLAY"):
-				if env.get("DISPLAY") == ":1024":
-					continue  # never try to use :1024 session as it seems to break gdm!
-				if env.get("XDG_SESSION_CLASS") == "greeter":
-					login_sessions.add(env["DISPLAY"])
-				else:
-					user_sessions.add(env["DISPLAY"])
-		except psutil.AccessDenied as err:
-			logger.debug(err)
-
-	sessions = list(user_sessions if user_sessions else login_sessions)
-	return sorted(sessions, key=lambda s: int(re.sub(r"\D", "", s)))
+	return _getActiveSessionIds(env for _pid, env in _iterProcessEnvironments("DISPLAY"))
 
 
 Posix.getActiveSessionIds = getActiveSessionIds
 
 
-def getSessionInformation(sessionId):
+def _getSessionInformation(sessionId, environments):
 	info = {
 		"SessionId": sessionId,
 		"DomainName": None,
 		"UserName": None,
 	}
-	for proc in psutil.process_iter():
-		try:
-			env = proc.environ()
-			if env.get("DISPLAY") == sessionId and env.get("USER"):
-				info["DomainName"] = env.get("HOST", info["DomainName"])
-				info["UserName"] = env.get("USER", info["UserName"])
-				break
-		except psutil.AccessDenied as err:
-			logger.debug(err)
+	for env in environments:
+		if env.get("DISPLAY") == sessionId and env.get("USER"):
+			info["DomainName"] = env.get("HOST", info["DomainName"])
+			info["UserName"] = env.get("USER", info["UserName"])
+			break
 	if not info["DomainName"]:
 		info["DomainName"] = socket.gethostname().upper()
 	return info
 
 
+def getSessionInformation(sessionId):
+	return _getSessionInformation(sessionId, (env for _pid, env in _iterProcessEnvironments("DISPLAY")))
+
+
 Posix.getSessionInformation = getSessionInformation
 
 
+def getActiveSessionInformation():
+	# Scan the processes once instead of once per session
+	environments = [env for _pid, env in _iterProcessEnvironments("DISPLAY")]
+	return [_getSessionInformation(sessionId, environments) for sessionId in _getActiveSessionIds(environments)]
+
+
+Posix.getActiveSessionInformation = getActiveSessionInformation
+
+
 def grant_session_access(username: str, session_id: str):
-	session_username = None
+	session_pid = None
 	session_env = {}
 
 	# trying to find process with XAUTHORITY (prefer non-greeter)
-	for proc in psutil.process_iter():
-		env = proc.environ()
+	for pid, env in _iterProcessEnvironments("DISPLAY"):
 		if env.get("DISPLAY") == session_id and env.get("XAUTHORITY"):
-			session_username = proc.username()
+			session_pid = pid
 			session_env = env
-			logger.debug("Found process of user %s with XDG_SESSION_CLASS %s", session_username, session_env.get("XDG_SESSION_CLASS"))
+			logger.debug("Found process %s with XDG_SESSION_CLASS %s", session_pid, session_env.get("XDG_SESSION_CLASS"))
 			if env.get("XDG_SESSION_CLASS") != "greeter":
 				break
 
 	if not session_env:
 		raise ValueError(f"Session {session_id} not found")
 
-	if "LD_PRELOAD" in session_env:
-		del session_env["LD_PRELOAD"]
-	if "PATH" in session_env:
-		# Keep current PATH
-		del session_env["PATH"]
+	# Only the owner of the chosen process is needed
+	session_username = _getProcessUsername(session_pid)
+	logger.debug("Session %s belongs to user %s", session_id, session_username)
 
-	sp_env = os.environ.copy()
-	sp_env.update(session_env)
-	sp_env = get_subprocess_environment(sp_env)
+	session_env.pop("LD_PRELOAD", None)
+	# Keep current PATH
+	session_env.pop("PATH", None)
+
+	sp_env = get_subprocess_environment({**os.environ, **session_env})
 	logger.debug("Using process env: %s", sp_env)
 
 	# Allow user to connect to X
 	xhost_cmd = ["sudo", "-u", session_username, "xhost", f"+si:localuser:{username}"]
 	logger.info("Running command %s", xhost_cmd)
-	process = subprocess.run(xhost_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=sp_env, check=False)
-	out = process.stdout.decode("utf-8", "replace") if process.stdout else ""
-	logger.debug("xhost output: %s", out)
+	# The output is only logged at debug level, do not capture it otherwise
+	if logger.isEnabledFor(logging.DEBUG):
+		stdout, stderr = subprocess.PIPE, subprocess.STDOUT
+	else:
+		stdout, stderr = subprocess.DEVNULL, subprocess.DEVNULL
+	process = subprocess.run(xhost_cmd, stdout=stdout, stderr=stderr, env=sp_env, check=False)
+	if process.stdout is not None:
+		logger.debug("xhost output: %s", process.stdout.decode("utf-8", "replace"))
 	return sp_env
 
 
@@ -238,11 +314,15 @@ Posix.grant_session_access = grant_session_access
 
 
 def is_mounted(devOrMountpoint):
-	with codecs.open("/proc/mounts", "r", "utf-8") as file:
-		for line in file.readlines():
-			(dev, mountpoint) = line.split(" ", 2)[:2]
-			if devOrMountpoint in (dev, mountpoint):
-				return True
+	# Compare bytes, decoding the whole mount table is not needed
+	devOrMountpoint = os.fsencode(devOrMountpoint)
+	with open("/proc/mounts", "rb") as file:
+		mounts = file.read()
+
+	for line in mounts.splitlines():
+		(dev, mountpoint) = line.split(b" ", 2)[:2]
+		if devOrMountpoint in (dev, mountpoint):
+			return True
 	return False
 
 
@@ -264,7 +344,7 @@ def mount(dev, mountpoint, **options):  # pylint: disable=too-many-locals,too-ma
 
 	tmp_files = []
 	if dev.lower().startswith(("smb://", "cifs://")):
-		match = re.search(r"^(smb|cifs)://([^/]+\/.+)$", dev, re.IGNORECASE)
+		match = _SMB_URI_REGEX.search(dev)
 		if match:
 			fs = "-t cifs"
 			parts = match.group(2).split("/")
@@ -274,7 +354,7 @@ def mount(dev, mountpoint, **options):  # pylint: disable=too-many-locals,too-ma
 			if "password" not in options:
 				options["password"] = ""
 			if "\\" in options["username"]:
-				options["username"] = re.sub(r"\\+", r"\\", options["username"])
+				options["username"] = _BACKSLASHES_REGEX.sub(r"\\", options["username"])
 				(options["domain"], options["username"]) = options["username"].split("\\", 1)
 
 			tf = tempfile.NamedTemporaryFile(mode="w", delete=False, encoding="iso-8859-15")  # pylint: disable=consider-using-with
@@ -296,7 +376,7 @@ def mount(dev, mountpoint, **options):  # pylint: disable=too-many-locals,too-ma
 	elif dev.lower().startswith(("webdav://", "webdavs://", "http://", "https://")):
 		# We need enough free space in /var/cache/davfs2
 		# Maximum transfer file size <= free space in /var/cache/davfs2
-		match = re.search(r"^(http|webdav)(s?)(://[^/]+\/.+)$", dev, re.IGNORECASE)
+		match = _WEBDAV_URL_REGEX.search(dev)
 		if match:
 			fs = "-t davfs"
 			dev = f"http{match.group(2)}{match.group(3)}"
@@ -319,13 +399,12 @@ def mount(dev, mountpoint, **options):  # pylint: disable=too-many-locals,too-ma
 					raise RuntimeError(f"ca_cert_file {ca_cert_file} not found")
 
 				# Make sure ca file is readable by davfs2
-				with open(ca_cert_file, "r", encoding="utf-8") as infile:
-					with tempfile.NamedTemporaryFile(mode="w", delete=False, encoding="utf-8") as tmp_cert_file:
+				with open(ca_cert_file, "rb") as infile:
+					with tempfile.NamedTemporaryFile(mode="wb", delete=False) as tmp_cert_file:
 						tmp_files.append(tmp_cert_file.name)
 						os.chmod(tmp_cert_file.name, 0o644)
 						conf_file.write(f"trust_ca_cert {tmp_cert_file.name}\n")
-						for line in infile.readlines():
-							tmp_cert_file.write(line)
+						shutil.copyfileobj(infile, tmp_cert_file)
 
 		# Username, Password, Accept certificate for this session? [y,N]
 		accept_cert = "n" if options.get("verify_server_cert") else "y"
@@ -343,26 +422,18 @@ def mount(dev, mountpoint, **options):  # pylint: disable=too-many-locals,too-ma
 	else:
 		raise ValueError(f"Cannot mount unknown fs type '{dev}'")
 
-	mount_options = []
-	for key, value in options.items():
-		if key in ("trust_ca_cert", "ca_cert_file", "verify_server_cert"):
-			continue
-		if value:
-			mount_options.append(f"{key}={value}")
-		else:
-			mount_options.append(key)
+	mount_options = [
+		f"{key}={value}" if value else key
+		for key, value in options.items()
+		if key not in ("trust_ca_cert", "ca_cert_file", "verify_server_cert")
+	]
 
 	try:
 		while True:
 			try:
-				if mount_options:
-					options = (",".join(mount_options)).replace('"', '\\"')
-					optString = f'-o "{options}"'
-				else:
-					optString = ""
-				proc_env = os.environ.copy()
-				proc_env["LC_ALL"] = "C"
-				execute(f"{which('mount')} {fs} {optString} {dev} {mountpoint}", env=proc_env, stdin_data=stdin_data)
+				optString = f"-o {quote(','.join(mount_options))}" if mount_options else ""
+				# execute adds this to the current environment
+				execute(f"{which('mount')} {fs} {optString} {dev} {mountpoint}", env={"LC_ALL": "C"}, stdin_data=stdin_data)
 				break
 			except Exception as err:  # pylint: disable=broad-except
 				if fs == "-t cifs" and "vers=2.0" not in mount_options and "error(95)" in str(err):
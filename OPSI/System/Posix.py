@@ -1127,8 +1127,8 @@ def getDiskSpaceUsage(path):
 
 def is_mounted(devOrMountpoint):
 	if platform.system() == "Linux":
-		with codecs.open("/proc/mounts", "r", "utf-8") as file:
-			for line in file.readlines():
+		with open("/proc/mounts", "r", encoding="utf-8") as file:
+			for line in file:
 				(dev, mountpoint) = line.split(" ", 2)[:2]
 				if devOrMountpoint in (dev, mountpoint):
 					return True
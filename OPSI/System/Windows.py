@@ -1629,10 +1629,10 @@ def runCommandInSession(  # pylint: disable=too-many-arguments,too-many-locals,u
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 # -                                     USER / GROUP HANDLING                                         -
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
-def createUser(username, password, groups=[]):  # pylint: disable=dangerous-default-value
+def createUser(username, password, groups=None):
 	username = forceUnicode(username)
 	password = forceUnicode(password)
-	groups = forceUnicodeList(groups)
+	groups = forceUnicodeList(groups) if groups else []
 	secret_filter.add_secrets(password)
 
 	domain = getHostname().upper()
@@ -131,7 +131,8 @@ class HostKeyFile(ConfigFile):
 
 			try:
 				hostId = forceHostId(match.group(1))
-				opsiHostKey = forceOpsiHostKey(match.group(2))
+				# lineRegex already ensures 32 hex digits, no need for forceOpsiHostKey
+				opsiHostKey = match.group(2).lower()
 				if hostId in self._opsiHostKeys:
 					logger.error("Found duplicate host '%s' in pckey file '%s'", hostId, self._filename)
 				self._opsiHostKeys[hostId] = opsiHostKey
@@ -192,7 +193,7 @@ class BackendACLFile(ConfigFile):
 
 		acl = []
 		for line in ConfigFile.parse(self):  # pylint: disable=too-many-nested-blocks
-			match = re.search(self.aclEntryRegex, line)
+			match = self.aclEntryRegex.search(line)
 			if not match:
 				raise ValueError(f"Found bad formatted line '{line}' in acl file '{self._filename}'")
 			method = match.group(1).strip()
@@ -447,6 +448,8 @@ class PackageControlFile(TextFile):  # pylint: disable=too-many-instance-attribu
 	sectionRegex = re.compile(r"^\s*\[([^\]]+)\]\s*$")
 	valueContinuationRegex = re.compile(r"^\s(.*)$")
 	optionRegex = re.compile(r"^([^\:]+)\s*\:\s*(.*)$")
+	packageDependencyRegex = re.compile(r"^\s*([^\(]+)\s*\(*\s*([^\)]*)\s*\)*")
+	dependencyVersionRegex = re.compile(r"^\s*([<>]?=?)\s*([\w\.]+-*[\w\.]*)\s*$")
 
 	def __init__(self, filename, lockFailTimeout=2000):
 		TextFile.__init__(self, filename, lockFailTimeout)
@@ -697,7 +700,7 @@ class PackageControlFile(TextFile):  # pylint: disable=too-many-instance-attribu
 		for option, value in self._sections.get("package", [{}])[0].items():
 			if option == "depends":
 				for dep in value:
-					match = re.search(r"^\s*([^\(]+)\s*\(*\s*([^\)]*)\s*\)*", dep)
+					match = self.packageDependencyRegex.search(dep)
 					if not match.group(1):
 						raise ValueError(f"Bad package dependency '{dep}' in control file")
 
@@ -705,7 +708,7 @@ class PackageControlFile(TextFile):  # pylint: disable=too-many-instance-attribu
 					version = match.group(2)
 					condition = None
 					if version:
-						match = re.search(r"^\s*([<>]?=?)\s*([\w\.]+-*[\w\.]*)\s*$", version)
+						match = self.dependencyVersionRegex.search(version)
 						if not match:
 							raise ValueError(f"Bad version string '{version}' in package dependency")
 
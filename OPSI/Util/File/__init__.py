@@ -302,7 +302,7 @@ class TextFile(LockableFile):
 	def getLines(self):
 		return self._lines
 
-	def writelines(self, sequence=[]):  # pylint: disable=dangerous-default-value
+	def writelines(self, sequence=None):
 		if not self._fileHandle:
 			raise IOError("File not opened")
 		if sequence:
@@ -467,9 +467,9 @@ class ChangelogFile(TextFile):
 
 
 class ConfigFile(TextFile):
-	def __init__(self, filename, lockFailTimeout=2000, commentChars=[";", "#"], lstrip=True):  # pylint: disable=dangerous-default-value
+	def __init__(self, filename, lockFailTimeout=2000, commentChars=None, lstrip=True):
 		TextFile.__init__(self, filename, lockFailTimeout)
-		self._commentChars = forceList(commentChars)
+		self._commentChars = [";", "#"] if commentChars is None else forceList(commentChars)
 		self._lstrip = forceBool(lstrip)
 		self._parsed = False
 
@@ -1043,10 +1043,10 @@ class TxtSetupOemFile(ConfigFile):  # pylint: disable=too-many-instance-attribut
 			raise ValueError(f"Device '{vendorId}:{deviceId}' not found in txtsetup.oem file '{self._filename}'")
 		return device
 
-	def getFilesForDevice(self, vendorId, deviceId, deviceType=None, fileTypes=[], architecture="x86"):  # pylint: disable=dangerous-default-value,too-many-arguments
+	def getFilesForDevice(self, vendorId, deviceId, deviceType=None, fileTypes=None, architecture="x86"):  # pylint: disable=too-many-arguments
 		vendorId = forceHardwareVendorId(vendorId)
 		deviceId = forceHardwareDeviceId(deviceId)
-		fileTypes = forceUnicodeLowerList(fileTypes)
+		fileTypes = forceUnicodeLowerList(fileTypes) if fileTypes else []
 		architecture = forceArchitecture(architecture)
 
 		device = self.getDevice(vendorId=vendorId, deviceId=deviceId, deviceType=deviceType, architecture=architecture)
@@ -1530,10 +1530,10 @@ class DHCPDConf_EmptyLine(DHCPDConf_Component):  # pylint: disable=invalid-name
 
 
 class DHCPDConf_Block(DHCPDConf_Component):  # pylint: disable=invalid-name
-	def __init__(self, startLine, parentBlock, type, settings=[]):  # pylint: disable=redefined-builtin,dangerous-default-value
+	def __init__(self, startLine, parentBlock, type, settings=None):  # pylint: disable=redefined-builtin
 		DHCPDConf_Component.__init__(self, startLine, parentBlock)
 		self.type = type
-		self.settings = settings
+		self.settings = [] if settings is None else settings
 		self.lineRefs = {}
 		self.components = []
 
@@ -81,7 +81,7 @@ class Subject:
 		}
 
 	def __str__(self):
-		return '<%s type: %s, id: %s>' % (self.__class__.__name__, self._type, self._id)
+		return f"<{self.__class__.__name__} type: {self._type}, id: {self._id}>"
 
 	def __repr__(self):
 		return self.__str__()
@@ -88,7 +88,10 @@ class OpsiBackup:
 
 		return OpsiBackupArchive(name=file, mode=mode, fileobj=fileobj)
 
-	def create(self, destination=None, mode="raw", backends=["auto"], noConfiguration=False, compression="bz2", flushLogs=False, **kwargs):  # pylint: disable=unused-argument,dangerous-default-value,too-many-arguments,too-many-branches
+	def create(self, destination=None, mode="raw", backends=None, noConfiguration=False, compression="bz2", flushLogs=False, **kwargs):  # pylint: disable=unused-argument,too-many-arguments,too-many-branches
+		if backends is None:
+			backends = ["auto"]
+
 		if "all" in backends:
 			backends = ["all"]
 
@@ -243,7 +246,7 @@ If this is `None` information will be read from the current system.
 
 		return differences
 
-	def restore(self, file, mode="raw", backends=[], configuration=True, force=False, new_server_id=None, **kwargs):  # pylint: disable=unused-argument,dangerous-default-value,too-many-arguments,too-many-locals,too-many-branches,too-many-statements
+	def restore(self, file, mode="raw", backends=None, configuration=True, force=False, new_server_id=None, **kwargs):  # pylint: disable=unused-argument,too-many-arguments,too-many-locals,too-many-branches,too-many-statements
 		if new_server_id:
 			new_server_id = forceHostId(new_server_id)
 
@@ -97,6 +97,8 @@ BLOWFISH_IV = b"OPSI1234"
 RANDOM_DEVICE = "/dev/urandom"
 UNIT_REGEX = re.compile(r"^(\d+\.*\d*)\s*(\w{0,4})$")
 _ACCEPTED_CHARACTERS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+# json.dumps only reuses its default encoder when called without options
+_BEAUTIFIED_JSON_ENCODER = json.JSONEncoder(indent=4)
 
 logger = get_logger("opsi.general")
 Version = namedtuple("Version", "product package")
@@ -196,7 +198,7 @@ def deserialize(obj, preventObjectCreation=False):
 
 
 def objectToBeautifiedText(obj):
-	return json.dumps(serialize(obj), indent=4)
+	return _BEAUTIFIED_JSON_ENCODER.encode(serialize(obj))
 
 
 def objectToBash(obj, bashVars=None, level=0):  # pylint: disable=too-many-branches
@@ -594,11 +596,17 @@ def ipAddressInNetwork(ipAddress, networkAddress):
 		ipAddress = ipAddress.ipv4_mapped
 
 	if not isinstance(networkAddress, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
-		networkAddress = ipaddress.ip_network(networkAddress)
+		networkAddress = _parseNetwork(networkAddress)
 
 	return ipAddress in networkAddress
 
 
+@lru_cache(maxsize=256)
+def _parseNetwork(networkAddress):
+	# Callers usually check many addresses against the same few networks.
+	return ipaddress.ip_network(networkAddress)
+
+
 def getfqdn(name="", conf=None):
 	"""
 	Get the fqdn.
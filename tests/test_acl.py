@@ -11,7 +11,7 @@ import os
 import pytest
 
 import OPSI.Object
-from OPSI.Exceptions import BackendPermissionDeniedError
+from OPSI.Exceptions import BackendAuthenticationError, BackendPermissionDeniedError
 from OPSI.Types import forceHostId
 from OPSI.Util import getfqdn
 from OPSI.Util.File.Opsi import BackendACLFile
@@ -43,6 +43,41 @@ host_.*: opsi_depotserver(depot1.test.invalid, depot2.test.invalid); opsi_client
 	assert expectedACL == BackendACLFile(aclFile).parse()
 
 
+class FailingAuthModule:
+	def get_instance(self):
+		return self
+
+	def authenticate(self, username, password):
+		raise RuntimeError("Authentication module denies every login")
+
+
+@pytest.mark.parametrize("username, expectedAuthType", [
+	("client.test.invalid", "opsi-hostkey"),
+	("client.test.invalid.", "opsi-hostkey"),
+	("client with space.test.invalid", "opsi-hostkey"),
+	("00:11:22:aa:BB:cc", "opsi-hostkey"),
+	# The previous regex accepted a trailing newline because of "$"
+	("client.test.invalid\n", "auth-module"),
+	("client.test.in valid", "auth-module"),
+	("client..invalid", "auth-module"),
+	("client.test", "auth-module"),
+	("00:11:22:aa:bb", "auth-module"),
+	("00:11:22:aa:bb:cc:dd", "auth-module"),
+	("someuser", "auth-module"),
+])
+def testDetectingAuthTypeFromUsername(extendedConfigDataBackend, username, expectedAuthType):
+	backendAccessControl = BackendAccessControl(
+		backend=extendedConfigDataBackend,
+		auth_module=FailingAuthModule(),
+		acl=[['.*', [{'type': 'sys_group', 'ids': ['opsiadmin'], 'denyAttributes': [], 'allowAttributes': []}]]]
+	)
+
+	with pytest.raises(BackendAuthenticationError):
+		backendAccessControl.authenticate(username, "password")
+
+	assert backendAccessControl.auth_type == expectedAuthType
+
+
 def testAllowingMethodsForSpecificClient(extendedConfigDataBackend):
 	"""
 	Access to methods can be limited to specific clients.
@@ -6,9 +6,23 @@
 Testing opsipxeconfd backend.
 """
 
+import json
+import os
+import stat
+import time
+from unittest import mock
+
 import pytest
-from OPSI.Backend.OpsiPXEConfd import OpsiPXEConfdBackend, getClientCacheFilePath
+import OPSI.Backend.OpsiPXEConfd
+from OPSI.Backend.OpsiPXEConfd import (
+	OpsiPXEConfdBackend,
+	ServerConnection,
+	UpdateThread,
+	getClientCacheFilePath,
+)
+from OPSI.Exceptions import BackendUnaccomplishableError
 from OPSI.Object import (
+	ConfigState,
 	NetbootProduct,
 	OpsiClient,
 	OpsiDepotserver,
@@ -39,6 +53,93 @@ def testGetClientCachePath():
 	assert path.endswith(".json")
 
 
+class DepotConfigContext:
+	"""Answers the queries for the depot of a client."""
+
+	def __init__(self, configStates, defaultValues):
+		self.configStates = configStates
+		self.defaultValues = defaultValues
+		self.queriedObjectIds = []
+
+	def configState_getObjects(self, configId, objectId):
+		self.queriedObjectIds.append(objectId)
+		return [cs for cs in self.configStates if cs.configId == configId and cs.objectId in objectId]
+
+	def config_getObjects(self, id):  # pylint: disable=redefined-builtin
+		return [UnicodeConfig(id=id, possibleValues=[], defaultValues=self.defaultValues)]
+
+
+@pytest.fixture()
+def depotConfigStates():
+	return [
+		ConfigState(configId="clientconfig.depot.id", objectId="client1.test.invalid", values=["depot2.test.invalid"]),
+		ConfigState(configId="clientconfig.depot.id", objectId="client2.test.invalid", values=["depot3.test.invalid"]),
+	]
+
+
+def testGettingResponsibleDepotsWithSingleQuery(depot, depotConfigStates):
+	context = DepotConfigContext(depotConfigStates, [depot.id])
+	clientIds = ["client1.test.invalid", "client2.test.invalid", "client3.test.invalid", "client4.test.invalid"]
+
+	with patchAddress(fqdn=depot.id):
+		backend = OpsiPXEConfdBackend(context=context)
+		depotIds = backend._getResponsibleDepotIds(clientIds)
+
+	assert depotIds == {
+		"client1.test.invalid": "depot2.test.invalid",
+		"client2.test.invalid": "depot3.test.invalid",
+		"client3.test.invalid": depot.id,
+		"client4.test.invalid": depot.id,
+	}
+	assert context.queriedObjectIds == [clientIds]
+
+
+def testGettingResponsibleDepotsWithoutDefault(depot, depotConfigStates):
+	context = DepotConfigContext(depotConfigStates, [])
+
+	with patchAddress(fqdn=depot.id):
+		backend = OpsiPXEConfdBackend(context=context)
+		assert backend._getResponsibleDepotIds(["client1.test.invalid"]) == {"client1.test.invalid": "depot2.test.invalid"}
+
+		with pytest.raises(BackendUnaccomplishableError) as excinfo:
+			backend._getResponsibleDepotIds(["client1.test.invalid", "client3.test.invalid", "client4.test.invalid"])
+
+	assert "client3.test.invalid, client4.test.invalid" in str(excinfo.value)
+	assert "client1.test.invalid" not in str(excinfo.value)
+
+
+def testGettingResponsibleDepotsForNoClients(depot):
+	context = DepotConfigContext([], [depot.id])
+
+	with patchAddress(fqdn=depot.id):
+		backend = OpsiPXEConfdBackend(context=context)
+		assert backend._getResponsibleDepotIds([]) == {}
+
+	assert not context.queriedObjectIds
+
+
+def testWritingCacheFile(tmp_path, monkeypatch):
+	monkeypatch.setattr(OPSI.Backend.OpsiPXEConfd, "_CACHE_DIRECTORY", str(tmp_path))
+	data = {"host": {"id": "foo.test.invalid"}, "productPropertyStates": {"lang": "de,en"}, "bootimageAppend": "äöü"}
+
+	path = OpsiPXEConfdBackend._cacheOpsiPXEConfdData("foo.test.invalid", data)
+
+	assert path == str(tmp_path / "foo.test.invalid.json")
+	with open(path, "rb") as cacheFile:
+		# Same ASCII-escaped JSON as written by json.dump before
+		assert cacheFile.read() == json.dumps(data).encode("ascii")
+	assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+	assert os.listdir(tmp_path) == ["foo.test.invalid.json"]
+
+
+def testWritingCacheFileWithUnencodableData(tmp_path, monkeypatch):
+	monkeypatch.setattr(OPSI.Backend.OpsiPXEConfd, "_CACHE_DIRECTORY", str(tmp_path))
+
+	assert OpsiPXEConfdBackend._cacheOpsiPXEConfdData("foo.test.invalid", {"host": object()}) is None
+	assert not list(tmp_path.glob("*.tmp"))
+	assert not (tmp_path / "foo.test.invalid.json").exists()
+
+
 def testCacheDataCollectionWithPxeConfigTemplate(backendManager, client, depot):
 	"""
 	Collection of caching data with a product with pxeConfigTemplate.
@@ -233,3 +334,128 @@ def testCacheDataCollectionWithMultiplePxeConfigTemplates(backendManager, client
 		data = backend._collectDataForUpdate(client.id, depot.id)
 
 		assert data["product"]["pxeConfigTemplate"] == newProduct.pxeConfigTemplate
+
+
+@pytest.fixture()
+def sentCommands(monkeypatch):
+	"""
+	Records the commands sent to opsipxeconfd instead of sending them.
+
+	Commands for clients whose id starts with "failing" fail.
+	"""
+	sent = []
+
+	def sendCommands(self, commands):  # pylint: disable=unused-argument
+		for clientId, command in commands:
+			sent.append((time.monotonic(), clientId, command))
+			if clientId.startswith("failing"):
+				yield clientId, RuntimeError(f"Command '{command}' failed")
+			else:
+				yield clientId, "ok"
+
+	monkeypatch.setattr(ServerConnection, "sendCommands", sendCommands)
+	monkeypatch.setattr(UpdateThread, "_DEFAULT_DELAY", 0.3)
+	return sent
+
+
+@pytest.fixture()
+def pxeBackend(depot):
+	with patchAddress(fqdn=depot.id):
+		backend = OpsiPXEConfdBackend()
+		yield backend
+		backend.backend_exit()
+
+
+def testUpdateThreadSendsOneCommandForRepeatedUpdates(pxeBackend, sentCommands):
+	for _ in range(5):
+		pxeBackend._updatePXEBootConfiguration("client1.test.invalid")
+	updateThread = pxeBackend._updateThread
+	updateThread.join(5)
+
+	assert not updateThread.is_alive()
+	assert [(clientId, command) for _, clientId, command in sentCommands] == [("client1.test.invalid", "update client1.test.invalid")]
+
+
+def testUpdateThreadResetsDelayOnNewUpdate(pxeBackend, sentCommands):
+	pxeBackend._updatePXEBootConfiguration("client1.test.invalid")
+	time.sleep(UpdateThread._DEFAULT_DELAY / 2)
+	resetAt = time.monotonic()
+	pxeBackend._updatePXEBootConfiguration("client1.test.invalid")
+	pxeBackend._updateThread.join(5)
+
+	assert len(sentCommands) == 1
+	sentAt, _, _ = sentCommands[0]
+	assert sentAt >= resetAt + UpdateThread._DEFAULT_DELAY
+
+
+def testUpdateThreadContinuesAfterFailingClient(pxeBackend, sentCommands):
+	pxeBackend._updatePXEBootConfiguration("failing.test.invalid")
+	time.sleep(UpdateThread._DEFAULT_DELAY / 2)
+	pxeBackend._updatePXEBootConfiguration("client1.test.invalid")
+	pxeBackend._updatePXEBootConfiguration("client2.test.invalid")
+	pxeBackend._updateThread.join(5)
+
+	assert [clientId for _, clientId, _ in sentCommands] == ["failing.test.invalid", "client1.test.invalid", "client2.test.invalid"]
+
+
+def testUpdateThreadIsRestartedWhenFinished(pxeBackend, sentCommands):
+	pxeBackend._updatePXEBootConfiguration("client1.test.invalid")
+	firstThread = pxeBackend._updateThread
+	firstThread.join(5)
+
+	assert not firstThread.addUpdate("client2.test.invalid", "update client2.test.invalid")
+
+	pxeBackend._updatePXEBootConfiguration("client2.test.invalid")
+	assert pxeBackend._updateThread is not firstThread
+	pxeBackend._updateThread.join(5)
+
+	assert [clientId for _, clientId, _ in sentCommands] == ["client1.test.invalid", "client2.test.invalid"]
+
+
+def testDeletingProductOnClientsUpdatesEachClientOnce(depot, sentCommands, tmp_path, monkeypatch):
+	monkeypatch.setattr(OPSI.Backend.OpsiPXEConfd, "_CACHE_DIRECTORY", str(tmp_path))
+	clientIds = ["client1.test.invalid", "client2.test.invalid"]
+	context = mock.MagicMock()
+	context.configState_getObjects.return_value = [
+		ConfigState(configId="clientconfig.depot.id", objectId=clientId, values=[depot.id]) for clientId in clientIds
+	]
+	context.host_getObjects.return_value = []
+
+	productOnClients = [
+		ProductOnClient(productId=productId, productType="NetbootProduct", clientId=clientId, actionRequest="setup")
+		for clientId in clientIds
+		for productId in ("win10-x64", "win11-x64")
+	]
+	productOnClients.append(
+		ProductOnClient(productId="firefox", productType="LocalbootProduct", clientId="client3.test.invalid", actionRequest="setup")
+	)
+
+	with patchAddress(fqdn=depot.id):
+		backend = OpsiPXEConfdBackend(context=context)
+		backend.productOnClient_deleteObjects(productOnClients)
+		backend.backend_exit()
+
+	context.configState_getObjects.assert_called_once()
+	assert [call.kwargs["id"] for call in context.host_getObjects.call_args_list] == clientIds
+	assert sorted(clientId for _, clientId, _ in sentCommands) == clientIds
+
+
+def testDeletingProductOnClientsJoinsErrors(depot, sentCommands):
+	context = mock.MagicMock()
+	context.configState_getObjects.return_value = []
+	context.config_getObjects.return_value = []
+
+	productOnClients = [
+		ProductOnClient(productId="win10-x64", productType="NetbootProduct", clientId=clientId, actionRequest="setup")
+		for clientId in ("client1.test.invalid", "client2.test.invalid")
+	]
+
+	with patchAddress(fqdn=depot.id):
+		backend = OpsiPXEConfdBackend(context=context)
+		with pytest.raises(RuntimeError) as excinfo:
+			backend.productOnClient_deleteObjects(productOnClients)
+
+	assert "client1.test.invalid" in str(excinfo.value)
+	assert "client2.test.invalid" in str(excinfo.value)
+	context.host_getObjects.assert_not_called()
+	assert not sentCommands
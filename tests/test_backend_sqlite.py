@@ -6,6 +6,8 @@
 Testing the opsi SQLite backend.
 """
 
+import sqlite3
+
 import pytest
 
 
@@ -15,3 +17,116 @@ def testInitialisationOfSQLiteBackendWithoutParametersDoesNotFail():
 
 	backend = SQLiteBackend()
 	backend.backend_createBase()
+
+
+def testWalJournalModeOnFileDatabase(tmp_path):
+	sqlModule = pytest.importorskip("OPSI.Backend.SQLite")
+
+	sql = sqlModule.SQLite(database=str(tmp_path / "opsi.sqlite"), journalMode="wal")
+	with sql.session() as session:
+		assert session.execute("PRAGMA journal_mode").scalar() == "wal"
+		assert session.execute("PRAGMA synchronous").scalar() == 1  # NORMAL
+
+
+def testJournalModeIsIgnoredForMemoryDatabase():
+	sqlModule = pytest.importorskip("OPSI.Backend.SQLite")
+
+	sql = sqlModule.SQLite(journalMode="WAL")
+	with sql.session() as session:
+		assert session.execute("PRAGMA journal_mode").scalar() == "memory"
+		assert session.execute("PRAGMA synchronous").scalar() == 2  # FULL
+
+
+def testInvalidJournalMode():
+	sqlModule = pytest.importorskip("OPSI.Backend.SQLite")
+
+	with pytest.raises(ValueError):
+		sqlModule.SQLite(journalMode="fast")
+
+
+def testDeletingDatabaseRemovesWalFiles(tmp_path):
+	sqlModule = pytest.importorskip("OPSI.Backend.SQLite")
+
+	sql = sqlModule.SQLite(database=str(tmp_path / "opsi.sqlite"), journalMode="WAL")
+	sql.disconnect()
+	# Left behind if the process did not close the database cleanly
+	for suffix in ("-wal", "-shm"):
+		(tmp_path / f"opsi.sqlite{suffix}").write_bytes(b"leftover")
+
+	sql.delete_db()
+
+	assert not list(tmp_path.iterdir())
+
+
+def testFailingAuditHardwareTableCreationIsRolledBack(tmp_path):
+	sqlModule = pytest.importorskip("OPSI.Backend.SQLite")
+
+	backend = sqlModule.SQLiteBackend(database=str(tmp_path / "opsi.sqlite"))
+	backend._auditHardwareConfig = {
+		"GOOD": {"name": {"Type": "varchar(100)", "Scope": "g"}, "description": {"Type": "varchar(100)", "Scope": "i"}},
+		"BAD": {"name": {"Type": "varchar(100),,", "Scope": "g"}},
+	}
+	with pytest.raises(sqlite3.OperationalError):
+		backend._createAuditHardwareTables()
+
+	with backend._sql.session() as session:
+		assert "HARDWARE_DEVICE_GOOD" not in backend._sql.getTables(session)
+
+	# The session is usable after the rollback
+	del backend._auditHardwareConfig["BAD"]
+	backend._createAuditHardwareTables()
+
+	with backend._sql.session() as session:
+		tables = backend._sql.getTables(session)
+	assert "name" in tables["HARDWARE_DEVICE_GOOD"]
+	assert "description" in tables["HARDWARE_CONFIG_GOOD"]
+
+
+def testHealthyDatabaseIsKept(tmp_path):
+	sqlModule = pytest.importorskip("OPSI.Backend.SQLite")
+
+	database = tmp_path / "opsi.sqlite"
+	with sqlite3.connect(database) as connection:
+		connection.execute("CREATE TABLE `MARKER` (`id` INTEGER)")
+	connection.close()
+
+	backend = sqlModule.SQLiteBackend(database=str(database))
+	backend.backend_createBase()
+
+	with backend._sql.session() as session:
+		tables = backend._sql.getTables(session)
+	assert "MARKER" in tables
+	assert "HOST" in tables
+
+
+def testHealthyDatabaseIsKeptOnOtherErrors(tmp_path, monkeypatch):
+	sqlModule = pytest.importorskip("OPSI.Backend.SQLite")
+
+	database = tmp_path / "opsi.sqlite"
+	backend = sqlModule.SQLiteBackend(database=str(database))
+	backend.backend_createBase()
+
+	def failingCreateBase(self):
+		raise sqlite3.OperationalError("database is locked")
+
+	monkeypatch.setattr(sqlModule.SQLBackend, "backend_createBase", failingCreateBase)
+	with pytest.raises(sqlite3.OperationalError):
+		backend.backend_createBase()
+
+	with backend._sql.session() as session:
+		assert "HOST" in backend._sql.getTables(session)
+
+
+def testCorruptedDatabaseIsRecreated(tmp_path):
+	sqlModule = pytest.importorskip("OPSI.Backend.SQLite")
+
+	database = tmp_path / "opsi.sqlite"
+	database.write_bytes(b"definitely not a database " * 1000)
+
+	backend = sqlModule.SQLiteBackend(database=str(database))
+	backend.backend_createBase()
+
+	assert database.read_bytes().startswith(b"SQLite format 3\0")
+	assert backend._sql.check_integrity()
+	with backend._sql.session() as session:
+		assert "HOST" in backend._sql.getTables(session)
@@ -10,10 +10,12 @@ Various unittests to test functionality of python-opsi.
 
 import os
 import re
+import types
 import pytest
 import psutil
 from contextlib import contextmanager
 
+import OPSI.System.Linux as Linux
 import OPSI.System.Posix as Posix
 
 from .helpers import mock
@@ -296,3 +298,118 @@ def testExecutingWithShellWorks():
 	Linux.
 	"""
 	Posix.execute('echo bla', shell=True)
+
+
+@pytest.fixture
+def fakeProc(tmp_path, monkeypatch):
+	"""
+	Makes OPSI.System.Linux read the given files from a temporary \
+directory instead of /proc.
+
+	Paths are relative to the proc root. A value of None creates a \
+directory instead of a file.
+	"""
+	def setup(files):
+		for path, content in files.items():
+			path = tmp_path / path
+			if content is None:
+				path.mkdir(parents=True)
+			else:
+				path.parent.mkdir(parents=True, exist_ok=True)
+				path.write_bytes(content)
+
+		monkeypatch.setattr(Linux, "_PROC_PATH", str(tmp_path))
+		return tmp_path
+
+	return setup
+
+
+@pytest.fixture
+def sessionProcesses(fakeProc):
+	return fakeProc({
+		# Not processes
+		"cpuinfo": b"processor\t: 0\n",
+		"self/environ": b"USER=self\0DISPLAY=:7\0",
+		"sys": None,
+		"1/environ": b"PATH=/usr/bin\0HOME=/root\0",
+		# Ended before its environment was read
+		"100": None,
+		# Cannot be read
+		"101/environ": None,
+		"200/environ": b"USER=alice\0DISPLAY=:0\0HOST=desktop\0XAUTHORITY=/home/alice/.Xauthority\0",
+		"201/environ": b"DISPLAY=:0\0USER=alice\0HOST=desktop\0",
+		"202/environ": b"USER=gdm\0DISPLAY=:1\0XDG_SESSION_CLASS=greeter\0",
+		"203/environ": b"USER=bob\0XDISPLAY=:5\0",
+		"204/environ": b"USER=carol\0DISPLAY=:10\0",
+		"205/environ": b"USER=gdm\0DISPLAY=:1024\0",
+	})
+
+
+def testIteratingProcessEnvironments(sessionProcesses):
+	environments = dict(Linux._iterProcessEnvironments())
+
+	assert sorted(environments) == [1, 200, 201, 202, 203, 204, 205]
+	assert environments[1] == {"PATH": "/usr/bin", "HOME": "/root"}
+	assert environments[200] == {"USER": "alice", "DISPLAY": ":0", "HOST": "desktop", "XAUTHORITY": "/home/alice/.Xauthority"}
+
+
+def testIteratingProcessEnvironmentsWithVariable(sessionProcesses):
+	environments = dict(Linux._iterProcessEnvironments("DISPLAY"))
+
+	# 203 only has a variable ending in DISPLAY
+	assert sorted(environments) == [200, 201, 202, 204, 205]
+	assert environments[201] == {"DISPLAY": ":0", "USER": "alice", "HOST": "desktop"}
+
+
+@pytest.mark.skipif(os.geteuid() == 0, reason="root can read every file")
+def testIteratingProcessEnvironmentsSkipsUnreadableProcesses(fakeProc):
+	procPath = fakeProc({
+		"200/environ": b"USER=alice\0DISPLAY=:0\0",
+		"300/environ": b"USER=root\0DISPLAY=:0\0",
+	})
+	(procPath / "300" / "environ").chmod(0)
+
+	assert [pid for pid, _env in Linux._iterProcessEnvironments("DISPLAY")] == [200]
+
+
+def testGettingActiveSessionIdsFromProc(sessionProcesses):
+	# Duplicates are removed, greeters and :1024 are ignored, ids are sorted numerically
+	assert Linux.getActiveSessionIds() == [":0", ":10"]
+
+
+def testGettingActiveSessionIdsFallsBackToGreeter(fakeProc):
+	fakeProc({
+		"202/environ": b"USER=gdm\0DISPLAY=:1\0XDG_SESSION_CLASS=greeter\0",
+		"300/environ": b"USER=root\0",
+	})
+
+	assert Linux.getActiveSessionIds() == [":1"]
+
+
+def testGettingSessionInformationFromProc(sessionProcesses, monkeypatch):
+	monkeypatch.setattr(Linux.socket, "gethostname", lambda: "opsi-client")
+
+	assert Linux.getSessionInformation(":0") == {"SessionId": ":0", "DomainName": "desktop", "UserName": "alice"}
+	assert Linux.getActiveSessionInformation() == [
+		{"SessionId": ":0", "DomainName": "desktop", "UserName": "alice"},
+		{"SessionId": ":10", "DomainName": "OPSI-CLIENT", "UserName": "carol"},
+	]
+
+
+def testGettingProcessUsernameFromRealUid(fakeProc, monkeypatch):
+	fakeProc({"200/status": b"Name:\tXorg\nUmask:\t0022\nUid:\t1000\t0\t0\t0\nGid:\t1000\t1000\t1000\t1000\n"})
+	users = {0: "root", 1000: "alice"}
+	monkeypatch.setattr(Linux.pwd, "getpwuid", lambda uid: types.SimpleNamespace(pw_name=users[uid]))
+
+	assert Linux._getProcessUsername(200) == "alice"
+
+
+def testGettingProcessUsernameFallsBackToUid(fakeProc, monkeypatch):
+	fakeProc({"200/status": b"Name:\tXorg\nUid:\t4242\t4242\t4242\t4242\n"})
+
+	def getpwuid(uid):
+		raise KeyError(f"getpwuid(): uid not found: {uid}")
+
+	monkeypatch.setattr(Linux.pwd, "getpwuid", getpwuid)
+
+	assert Linux._getProcessUsername(200) == "4242"